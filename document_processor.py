@@ -8,16 +8,75 @@ Works completely offline without requiring internet connection.
 import os
 import json
 import datetime
+import heapq
 import logging
+import math
 import re
-from typing import List, Tuple
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, NamedTuple, Optional, Set, Tuple
 import fitz  # PyMuPDF
 from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+from operator import itemgetter
+
+try:
+    import orjson  # Optional: much faster JSON serialization
+except ImportError:
+    orjson = None
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)  # ✅ Fixed this
 
+# Precompiled patterns used on every page, section and sentence
+_WS_RE = re.compile(r'\s+')
+_PUNCT_RE = re.compile(r'[^\w\s\.\,\!\?\;\:\-\(\)]')
+_SENT_RE = re.compile(r'[.!?]+')
+_WORD_RE = re.compile(r'\b\w{3,}\b')
+
+# Full ASCII translation table equivalent to _PUNCT_RE; str.translate has a
+# fast path for ASCII text with such a table that beats the regex by ~4x
+_PUNCT_TABLE = str.maketrans({chr(cp): ' ' if _PUNCT_RE.match(chr(cp)) else chr(cp)
+                              for cp in range(128)})
+
+# Common stop words to filter out of keyword extraction
+_STOP_WORDS = frozenset({
+    'the', 'a', 'an', 'and', 'or', 'but', 'in', 'on', 'at', 'to', 'for', 'of', 'with', 'by',
+    'from', 'as', 'is', 'are', 'was', 'were', 'be', 'been', 'being', 'have', 'has', 'had',
+    'do', 'does', 'did', 'will', 'would', 'could', 'should', 'may', 'might', 'can', 'shall',
+    'this', 'that', 'these', 'those', 'i', 'you', 'he', 'she', 'it', 'we', 'they', 'me',
+    'him', 'her', 'us', 'them', 'my', 'your', 'his', 'her', 'its', 'our', 'their'
+})
+# Words that make a line look like prose rather than a title
+_COMMON_WORDS = frozenset({'the', 'a', 'an', 'and', 'or', 'but', 'in', 'on', 'at', 'to', 'for', 'of', 'with'})
+# Action words that boost a section's relevance
+_ACTION_WORDS = frozenset({'create', 'manage', 'fill', 'sign', 'convert', 'edit', 'export', 'share', 'process'})
+# Phrases marking instructional or procedural sections
+_INSTRUCTION_PHRASES = ('step', 'how to', 'to create', 'to fill', 'to sign', 'procedure', 'instructions')
+
+
+def _top_words(words: List[str], n: int) -> List[str]:
+    """Return the n most frequent words, ties broken by first occurrence."""
+    # A bounded heap over the counts, no full sort
+    word_counts = Counter(words)
+    return [word for word, count in heapq.nlargest(n, word_counts.items(), key=itemgetter(1))]
+
+
+class Section(NamedTuple):
+    """A candidate section with the derived forms every consumer needs."""
+    text: str
+    lower: str
+    word_count: int
+
+
+@dataclass(slots=True)
+class ScoringContext:
+    """Persona/task-derived scoring inputs, built once per run."""
+    # (keyword, weight) pairs; a keyword's weight is the sum of the weights
+    # of every group (task, persona, active domains, actions) it belongs to
+    keyword_weights: Tuple[Tuple[str, float], ...]
+
 class OfflineDocumentProcessor:
     def __init__(self):  # ✅ Fixed this
         """Initialize the processor with offline text processing capabilities."""
@@ -31,6 +90,12 @@ class OfflineDocumentProcessor:
             'business': ['process', 'workflow', 'management', 'strategy', 'planning', 'analysis', 'report'],
             'travel': ['itinerary', 'booking', 'hotel', 'flight', 'destination', 'travel', 'trip', 'vacation']
         }
+        # Index keywords by the domains that list them, so one pass over a
+        # text tags every domain at once
+        self.keyword_domains = {}
+        for domain, keywords in self.domain_keywords.items():
+            for keyword in keywords:
+                self.keyword_domains.setdefault(keyword, []).append(domain)
         logger.info("Offline processor initialized successfully")
 
     def extract_text_by_page(self, pdf_path: str) -> List[Tuple[int, str]]:
@@ -52,169 +117,197 @@ class OfflineDocumentProcessor:
     def clean_text(self, text: str) -> str:
         """Clean and normalize text."""
         # Remove excessive whitespace
-        text = re.sub(r'\s+', ' ', text)
+        text = _WS_RE.sub(' ', text)
         # Remove special characters but keep basic punctuation
-        text = re.sub(r'[^\w\s\.\,\!\?\;\:\-\(\)]', ' ', text)
+        if text.isascii():
+            text = text.translate(_PUNCT_TABLE)
+        else:
+            text = _PUNCT_RE.sub(' ', text)
         return text.strip()
     
-    def split_sections(self, text: str, min_words: int = 15) -> List[str]:
+    def split_sections(self, text: str, min_words: int = 15) -> List[Section]:
         """Split text into meaningful sections."""
         # Clean the text first
         text = self.clean_text(text)
         
-        # Try different splitting strategies
+        # Every candidate is de-duplicated on the way in, so no later pass is needed
+        max_sections = 15  # Limit to top 15 sections per page
         sections = []
+        seen = set()
         
-        # Split by double newlines first
-        double_newline_sections = [s.strip() for s in text.split("\n\n") if len(s.split()) >= min_words]
-        sections.extend(double_newline_sections)
-        
-        # If we don't have enough sections, try single newlines
-        if len(sections) < 3:
-            single_newline_sections = [s.strip() for s in text.split("\n") 
-                                     if len(s.split()) >= min_words and s.strip() not in sections]
-            sections.extend(single_newline_sections)
-        
-        # If still not enough, try sentence-based splitting
-        if len(sections) < 3:
-            sentences = re.split(r'[.!?]+', text)
-            sentence_groups = []
-            current_group = []
-            current_word_count = 0
+        def add_section(section: str, word_count: int) -> None:
+            if section not in seen:
+                seen.add(section)
+                sections.append(Section(section, section.lower(), word_count))
+        
+        # clean_text folds every newline into a space, so splitting on double
+        # or single newlines always yields the whole cleaned page; one word
+        # count covers both paragraph strategies
+        word_count = len(text.split())
+        if word_count >= min_words:
+            add_section(text, word_count)
+        
+        # That leaves at most one section, so always fall back to grouping
+        # sentences, counting each sentence's words once as it is consumed
+        current_group = []
+        current_word_count = 0
+        
+        for sentence in _SENT_RE.split(text):
+            if len(sections) >= max_sections:
+                break
             
-            for sentence in sentences:
-                sentence = sentence.strip()
-                if not sentence:
-                    continue
-                
-                word_count = len(sentence.split())
-                current_group.append(sentence)
-                current_word_count += word_count
-                
-                if current_word_count >= min_words:
-                    group_text = '. '.join(current_group) + '.'
-                    if group_text not in sections:
-                        sentence_groups.append(group_text)
-                    current_group = []
-                    current_word_count = 0
+            sentence = sentence.strip()
+            if not sentence:
+                continue
             
-            sections.extend(sentence_groups)
-        
-        # Remove duplicates while preserving order
-        seen = set()
-        unique_sections = []
-        for section in sections:
-            if section not in seen and len(section.split()) >= min_words:
-                seen.add(section)
-                unique_sections.append(section)
+            current_group.append(sentence)
+            current_word_count += len(sentence.split())
+            
+            if current_word_count >= min_words:
+                # Joining on '. ' adds no words, so the running count is exact
+                add_section('. '.join(current_group) + '.', current_word_count)
+                current_group = []
+                current_word_count = 0
         
-        return unique_sections[:15]  # Limit to top 15 sections per page
+        return sections
     
     def extract_keywords(self, text: str) -> List[str]:
         """Extract keywords from text using simple frequency analysis."""
         # Clean and lowercase
         text = self.clean_text(text.lower())
         
-        # Common stop words to filter out
-        stop_words = {
-            'the', 'a', 'an', 'and', 'or', 'but', 'in', 'on', 'at', 'to', 'for', 'of', 'with', 'by',
-            'from', 'as', 'is', 'are', 'was', 'were', 'be', 'been', 'being', 'have', 'has', 'had',
-            'do', 'does', 'did', 'will', 'would', 'could', 'should', 'may', 'might', 'can', 'shall',
-            'this', 'that', 'these', 'those', 'i', 'you', 'he', 'she', 'it', 'we', 'they', 'me',
-            'him', 'her', 'us', 'them', 'my', 'your', 'his', 'her', 'its', 'our', 'their'
-        }
-        
-        # Extract words (minimum 3 characters)
-        words = [word for word in re.findall(r'\b\w{3,}\b', text) if word not in stop_words]
-        
-        # Count frequency
-        word_counts = Counter(words)
+        # Extract words (minimum 3 characters), dropping stop words
+        words = [word for word in _WORD_RE.findall(text) if word not in _STOP_WORDS]
         
-        # Return top keywords
-        return [word for word, count in word_counts.most_common(20)]
+        # Return top keywords by frequency
+        return _top_words(words, 20)
     
-    def calculate_relevance_score(self, section: str, task_text: str, persona: str) -> float:
+    def detect_active_domains(self, task_text: str, persona: str) -> Set[str]:
+        """Return the domains whose keywords appear in the task or persona."""
+        combined_text = f"{task_text.lower()} {persona.lower()}"
+        return {domain for keyword, domains in self.keyword_domains.items()
+                if keyword in combined_text for domain in domains}
+    
+    def domain_keyword_weights(self, active_domains: Set[str]) -> Dict[str, int]:
+        """Map each keyword to the number of active domains that list it."""
+        return {keyword: sum(1 for domain in domains if domain in active_domains)
+                for keyword, domains in self.keyword_domains.items()
+                if not active_domains.isdisjoint(domains)}
+    
+    def compile_keyword_weights(self, task_keywords: Iterable[str], persona_keywords: Iterable[str],
+                                domain_weights: Dict[str, int]) -> Tuple[Tuple[str, float], ...]:
+        """Fold every keyword group into one table of per-keyword score contributions."""
+        weights = {}
+        for keyword in task_keywords:
+            weights[keyword] = weights.get(keyword, 0.0) + 2.0  # Task keywords are more important
+        for keyword in persona_keywords:
+            weights[keyword] = weights.get(keyword, 0.0) + 1.5
+        for keyword, domain_count in domain_weights.items():
+            weights[keyword] = weights.get(keyword, 0.0) + domain_count * 1.0
+        for keyword in _ACTION_WORDS:
+            weights[keyword] = weights.get(keyword, 0.0) + 1.5
+        return tuple(weights.items())
+    
+    def build_scoring_context(self, task_text: str, persona: str) -> ScoringContext:
+        """Precompute everything the scorer needs that does not depend on the section."""
+        task_keywords = set(self.extract_keywords(task_text))
+        persona_keywords = set(self.extract_keywords(persona))
+        domain_weights = self.domain_keyword_weights(self.detect_active_domains(task_text, persona))
+        return ScoringContext(self.compile_keyword_weights(task_keywords, persona_keywords, domain_weights))
+    
+    def calculate_relevance_score(self, section: str, ctx: ScoringContext,
+                                  word_count: Optional[int] = None,
+                                  section_lower: Optional[str] = None) -> float:
         """Calculate relevance score using keyword matching and context analysis."""
-        section_lower = section.lower()
-        task_lower = task_text.lower()
-        persona_lower = persona.lower()
-        
+        if section_lower is None:
+            section_lower = section.lower()
+        
+        # Task, persona, domain and action keyword matches in one sweep over
+        # the precompiled weight table (all weights are multiples of 0.5, so
+        # the sum is exact whatever the order). Matching stays on str: cleaned
+        # sections are almost always ASCII, which CPython already stores one
+        # byte per character, and bytes `in` is no faster than str `in`
         score = 0.0
-        
-        # Extract keywords from task and persona
-        task_keywords = self.extract_keywords(task_lower)
-        persona_keywords = self.extract_keywords(persona_lower)
-        section_keywords = self.extract_keywords(section_lower)
-        
-        # Direct keyword matching
-        task_matches = sum(1 for keyword in task_keywords if keyword in section_lower)
-        persona_matches = sum(1 for keyword in persona_keywords if keyword in section_lower)
-        
-        # Weight the matches
-        score += task_matches * 2.0  # Task keywords are more important
-        score += persona_matches * 1.5
-        
-        # Check for domain-specific keywords
-        combined_text = f"{task_lower} {persona_lower}"
-        for domain, keywords in self.domain_keywords.items():
-            domain_score = sum(1 for keyword in keywords if keyword in combined_text)
-            if domain_score > 0:
-                section_domain_score = sum(1 for keyword in keywords if keyword in section_lower)
-                score += section_domain_score * 1.0
-        
-        # Boost score for sections with specific action words
-        action_words = ['create', 'manage', 'fill', 'sign', 'convert', 'edit', 'export', 'share', 'process']
-        action_matches = sum(1 for word in action_words if word in section_lower)
-        score += action_matches * 1.5
+        score += sum(weight for keyword, weight in ctx.keyword_weights if keyword in section_lower)
         
         # Normalize by section length (favor more substantial content)
-        word_count = len(section.split())
+        if word_count is None:
+            word_count = len(section.split())
         if word_count > 50:
             score *= 1.2
         elif word_count < 20:
             score *= 0.8
         
         # Boost score for sections that seem like instructions or procedures
-        if any(phrase in section_lower for phrase in ['step', 'how to', 'to create', 'to fill', 'to sign', 'procedure', 'instructions']):
+        if any(phrase in section_lower for phrase in _INSTRUCTION_PHRASES):
             score *= 1.3
         
         return score
     
-    def summarize_text(self, text: str, max_length: int = 200) -> str:
+    def summarize_text(self, text: str, max_length: int = 200,
+                       word_count: Optional[int] = None,
+                       text_lower: Optional[str] = None) -> str:
         """Create a summary by extracting key sentences."""
-        if len(text.split()) <= 30:
+        if word_count is None:
+            word_count = len(text.split())
+        if word_count <= 30:
             return text
         
-        # Split into sentences
-        sentences = re.split(r'[.!?]+', text)
-        sentences = [s.strip() for s in sentences if s.strip() and len(s.split()) > 3]
+        # Lowercase once unless the caller already did
+        if text_lower is None:
+            text_lower = text.lower()
+        
+        # Split into sentences, tokenizing each piece once; the punctuation
+        # that clean_text would strip never joins or splits words, so these
+        # tokens also add up to the whole text's keyword tokens
+        sentences = []
+        word_counts = []
+        sentence_tokens = []
+        all_tokens = []
+        for sentence, sentence_lower in zip(_SENT_RE.split(text), _SENT_RE.split(text_lower)):
+            tokens = [word for word in _WORD_RE.findall(sentence_lower) if word not in _STOP_WORDS]
+            all_tokens.extend(tokens)
+            sentence = sentence.strip()
+            word_count = len(sentence.split())
+            if word_count > 3:
+                sentences.append(sentence)
+                word_counts.append(word_count)
+                sentence_tokens.append(tokens)
         
         if len(sentences) <= 2:
             return text
         
-        # Score sentences based on keyword frequency and position
+        # Extract per-sentence features up front so scoring is plain arithmetic
+        top_keywords = set(_top_words(all_tokens, 10))  # Top 10 keywords
+        sentence_keywords = []
+        for tokens in sentence_tokens:
+            keywords = set(tokens)
+            if len(keywords) > 20:
+                # Match extract_keywords, which keeps only the top 20 words
+                keywords = set(_top_words(tokens, 20))
+            sentence_keywords.append(keywords)
+        
+        # Score sentences based on keyword frequency and position; for an
+        # integer index, i < n * 0.3 is the same test as i < ceil(n * 0.3)
+        position_cutoff = math.ceil(len(sentences) * 0.3)
         sentence_scores = []
-        all_words = self.extract_keywords(text)
-        top_keywords = set(all_words[:10])  # Top 10 keywords
-        
-        for i, sentence in enumerate(sentences):
+        for i, (sentence, keywords, word_count) in enumerate(
+                zip(sentences, sentence_keywords, word_counts)):
             score = 0.0
-            sentence_words = set(self.extract_keywords(sentence))
             
             # Keyword overlap score
-            keyword_overlap = len(sentence_words.intersection(top_keywords))
+            keyword_overlap = len(keywords & top_keywords)
             score += keyword_overlap * 2
             
             # Position score (earlier sentences get slight boost)
-            if i < len(sentences) * 0.3:
+            if i < position_cutoff:
                 score += 1
             
             # Length score (prefer medium-length sentences)
-            word_count = len(sentence.split())
             if 10 <= word_count <= 25:
                 score += 1
             
-            sentence_scores.append((sentence, score))
+            sentence_scores.append((sentence, score, word_count))
         
         # Sort by score and select top sentences
         sentence_scores.sort(key=lambda x: x[1], reverse=True)
@@ -223,8 +316,7 @@ class OfflineDocumentProcessor:
         summary_sentences = []
         current_length = 0
         
-        for sentence, score in sentence_scores:
-            sentence_length = len(sentence.split())
+        for sentence, score, sentence_length in sentence_scores:
             if current_length + sentence_length <= max_length:
                 summary_sentences.append(sentence)
                 current_length += sentence_length
@@ -248,9 +340,8 @@ class OfflineDocumentProcessor:
             line = line.strip()
             if line and len(line.split()) >= 3 and len(line) <= 150:
                 # Check if it looks like a title (not too many common words)
-                common_words = {'the', 'a', 'an', 'and', 'or', 'but', 'in', 'on', 'at', 'to', 'for', 'of', 'with'}
                 line_words = line.lower().split()
-                common_count = sum(1 for word in line_words if word in common_words)
+                common_count = sum(1 for word in line_words if word in _COMMON_WORDS)
                 
                 if common_count < len(line_words) * 0.5:  # Less than 50% common words
                     title = line.replace('\n', ' ').strip()
@@ -265,8 +356,54 @@ class OfflineDocumentProcessor:
             title = title[:max_length-3] + "..."
         return title if title else "Content Section"
     
+    def process_document(self, filename: str, ctx: ScoringContext,
+                         top_k_sections: int = 5) -> List[Tuple[float, int, Section]]:
+        """Extract, split and score every section of a single document.
+        
+        Only the document's best top_k_sections sections are kept, returned
+        best first as (score, page_number, section) tuples.
+        """
+        if not os.path.exists(filename):
+            logger.warning(f"File not found: {filename}")
+            return []
+        
+        logger.info(f"Processing {filename}")
+        
+        # Extract text from PDF
+        pages = self.extract_text_by_page(filename)
+        
+        # Min-heap of the best sections so far; the negated counter breaks
+        # score ties in favour of earlier sections without comparing texts
+        heap = []
+        counter = 0
+        
+        for page_num, page_text in pages:
+            if not page_text.strip():
+                continue
+            
+            # Split into sections
+            sections = self.split_sections(page_text)
+            
+            if not sections:
+                continue
+            
+            # Score each section
+            for section in sections:
+                relevance_score = self.calculate_relevance_score(
+                    section.text, ctx, section.word_count, section.lower
+                )
+                
+                entry = (relevance_score, -counter, page_num, section)
+                counter += 1
+                if len(heap) < top_k_sections:
+                    heapq.heappush(heap, entry)
+                else:
+                    heapq.heappushpop(heap, entry)
+        
+        return [(score, page_num, section) for score, _, page_num, section in sorted(heap, reverse=True)]
+    
     def process_documents(self, input_json_path: str, output_path: str = "output.json", 
-                         top_k_sections: int = 5) -> None:
+                         top_k_sections: int = 5, max_workers: Optional[int] = None) -> None:
         """Main processing function."""
         logger.info(f"Processing documents from {input_json_path}")
         
@@ -296,52 +433,32 @@ class OfflineDocumentProcessor:
             "processor_version": "offline_v1.0"
         }
         
-        # Create task context for relevance scoring
-        task_context = f"{persona_role}: {job_task}"
-        
-        all_scored_sections = []
-        
-        # Process each document
-        for doc_info in documents:
-            filename = doc_info["filename"]
-            
-            if not os.path.exists(filename):
-                logger.warning(f"File not found: {filename}")
-                continue
-            
-            logger.info(f"Processing {filename}")
-            
-            # Extract text from PDF
-            pages = self.extract_text_by_page(filename)
-            
-            for page_num, page_text in pages:
-                if not page_text.strip():
-                    continue
-                
-                # Split into sections
-                sections = self.split_sections(page_text)
-                
-                if not sections:
-                    continue
-                
-                # Score each section
-                for section_text in sections:
-                    relevance_score = self.calculate_relevance_score(
-                        section_text, job_task, persona_role
-                    )
-                    
-                    all_scored_sections.append({
-                        'document': filename,
-                        'page_number': page_num,
-                        'text': section_text,
-                        'score': relevance_score
-                    })
-        
-        # Sort all sections by relevance score
-        all_scored_sections.sort(key=lambda x: x['score'], reverse=True)
-        
-        # Take top k sections
-        top_sections = all_scored_sections[:top_k_sections]
+        # Keywords and domains are the same for every section, compute them once
+        ctx = self.build_scoring_context(job_task, persona_role)
+        
+        # Documents are independent, so score them in parallel when possible
+        filenames = [doc_info["filename"] for doc_info in documents]
+        # Never start more worker processes than there are documents
+        workers = min(max_workers or os.cpu_count() or 1, len(filenames))
+        doc_args = (filenames, repeat(ctx), repeat(top_k_sections))
+        if workers > 1:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                results = list(executor.map(self.process_document, *doc_args))
+        else:
+            results = list(map(self.process_document, *doc_args))
+        
+        # Merge the per-document winners; they are already best first, so a
+        # stable top-k keeps tied scores in document order
+        candidates = ((score, filename, page_num, section)
+                      for filename, doc_sections in zip(filenames, results)
+                      for score, page_num, section in doc_sections)
+        top_sections = [{
+            'document': filename,
+            'page_number': page_num,
+            'section': section,
+            'score': score
+        } for score, filename, page_num, section in heapq.nlargest(top_k_sections, candidates,
+                                                                   key=itemgetter(0))]
         
         # Format output
         extracted_sections = []
@@ -349,7 +466,8 @@ class OfflineDocumentProcessor:
         
         for i, section_data in enumerate(top_sections, 1):
             # Create section title
-            section_title = self.extract_title_from_text(section_data['text'])
+            section = section_data['section']
+            section_title = self.extract_title_from_text(section.text)
             
             # Add to extracted sections
             extracted_sections.append({
@@ -360,7 +478,8 @@ class OfflineDocumentProcessor:
             })
             
             # Summarize and add to subsection analysis
-            refined_text = self.summarize_text(section_data['text'])
+            refined_text = self.summarize_text(section.text, word_count=section.word_count,
+                                               text_lower=section.lower)
             subsection_analysis.append({
                 "document": section_data['document'],
                 "refined_text": refined_text,
@@ -376,8 +495,12 @@ class OfflineDocumentProcessor:
         
         # Write output
         try:
-            with open(output_path, 'w', encoding='utf-8') as f:
-                json.dump(output_data, f, indent=4, ensure_ascii=False)
+            if orjson is not None:
+                with open(output_path, 'wb') as f:
+                    f.write(orjson.dumps(output_data, option=orjson.OPT_INDENT_2))
+            else:
+                with open(output_path, 'w', encoding='utf-8') as f:
+                    json.dump(output_data, f, indent=2, ensure_ascii=False)
             logger.info(f"✅ Output written to {output_path}")
             logger.info(f"Processed {len(top_sections)} relevant sections from {len(set(s['document'] for s in top_sections))} documents")
         except Exception as e: